@@ -0,0 +1,87 @@
+import argparse
+import csv
+from validate_IC import validate_nric_fin_batch
+from user_store import load_user_data, save_user_data, is_valid_email, is_valid_dob
+
+# Columns a roster CSV must have
+ROSTER_COLUMNS = ("telegram_id", "ic", "dob", "email")
+
+def import_roster(csv_path: str, strict: bool = False, dry_run: bool = False):
+    """
+    Import a roster CSV of travellers into the user store.
+
+    csv_path: CSV file with columns telegram_id, ic, dob (DD/MM/YYYY), email
+    strict: True → save nothing if any row is invalid
+    dry_run: True → validate only, never save
+
+    Every NRIC/FIN is validated in a single batch, then valid rows are written
+    to the user store in one save.
+    Returns (number of records imported, list of (line number, error) tuples).
+    Raises ValueError if the header is missing a required column or the file is not valid CSV.
+    """
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        try:
+            missing = [c for c in ROSTER_COLUMNS if c not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"Missing column(s): {', '.join(missing)}")
+            rows = [[(row[c] or "").strip() for c in ROSTER_COLUMNS] for row in reader]
+        except csv.Error as e:
+            # line_num is the last line read successfully
+            raise ValueError(f"Malformed CSV at line {reader.line_num + 1}: {e}") from e
+
+    ic_ok = validate_nric_fin_batch([row[1] for row in rows])
+
+    records = {}
+    errors = []
+    # line 1 is the header
+    for line, (telegram_id, ic, dob, email), valid_ic in zip(range(2, len(rows) + 2), rows, ic_ok):
+        row_errors = []
+        if not telegram_id.isdigit():
+            row_errors.append("invalid Telegram ID")
+        elif telegram_id in records:
+            row_errors.append("duplicate Telegram ID")
+        if not valid_ic:
+            row_errors.append("invalid NRIC/FIN")
+        if not is_valid_dob(dob):
+            row_errors.append("invalid date of birth")
+        if not is_valid_email(email.lower()):
+            row_errors.append("invalid email")
+
+        if row_errors:
+            errors.append((line, ", ".join(row_errors)))
+            continue
+        records[telegram_id] = {
+            'ic': ic.upper(),
+            'dob': dob,
+            'email': email.lower()
+        }
+
+    if dry_run or not records or (strict and errors):
+        return 0, errors
+
+    user_data = load_user_data()
+    user_data.update(records)
+    save_user_data(user_data)
+    return len(records), errors
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a roster CSV of travellers into the user store.")
+    parser.add_argument("csv_path", help="CSV with columns telegram_id, ic, dob, email")
+    parser.add_argument("--strict", action="store_true", help="import nothing if any row is invalid")
+    parser.add_argument("--dry-run", action="store_true", help="validate without saving")
+    args = parser.parse_args()
+
+    try:
+        imported, errors = import_roster(args.csv_path, strict=args.strict, dry_run=args.dry_run)
+    except ValueError as e:
+        parser.exit(1, f"❌ {e}\n")
+
+    for line, error in errors:
+        print(f"❌ Line {line}: {error}")
+    print(f"✅ Imported {imported} record(s), {len(errors)} invalid row(s)")
+    if errors:
+        parser.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,29 @@ import time
 import base64
 import os
 from playwright.async_api import async_playwright
-from obtain_captcha import get_captcha_text
+from obtain_captcha import solve_captcha, invalidate_captcha
 
-async def download_arrival_card(resident: bool, arrival_date: str, ic: str, dob: str, email: str) -> None:
+async def download_arrival_card(resident: bool, arrival_date: str, ic: str, dob: str, email: str, result: dict = None) -> dict:
     """
     resident: True → SCPR (use NRIC), False → LTP (use FIN)
     arrival_date: exact text of the date-button, e.g. "24/05/"
     ic: NRIC or FIN string
     dob: Date of Birth string, e.g. "20/11/1998"
     email: your email address
+    result: optional dict filled in as the run progresses, so the caller still has
+            the phases measured so far if this raises
+
+    Returns {"outcome", "solver", "timings"}: outcome is "success", "captcha_not_found"
+    or "download_failed"; timings are seconds spent per phase (form, captcha, download).
     """
     url = "https://eservices.ica.gov.sg/sgarrivalcard/scpr" if resident else "https://eservices.ica.gov.sg/sgarrivalcard/ltp"
     id_label = "NRIC * ! Please fill in the" if resident else "FIN * ! Please fill in the"
 
+    if result is None:
+        result = {}
+    result.update({"outcome": "success", "solver": None, "timings": {}})
+    phase_start = time.monotonic()
+
     async with async_playwright() as p:
         browser = await p.chromium.launch(headless=True)
         page = await browser.new_page()
@@ -36,10 +46,12 @@ async def download_arrival_card(resident: bool, arrival_date: str, ic: str, dob:
         # extract & save captcha
         img = await page.wait_for_selector("img.bg_color")
         src = await img.get_attribute("src") or ""
+        result["timings"]["form"] = round(time.monotonic() - phase_start, 3)
         if not src.startswith("data:image"):
             print("❌ CAPTCHA not found")
             await browser.close()
-            return
+            result["outcome"] = "captcha_not_found"
+            return result
 
         header, b64 = src.split(",", 1)
         ext = header.split("/")[1].split(";")[0]      # e.g. 'png'
@@ -49,11 +61,14 @@ async def download_arrival_card(resident: bool, arrival_date: str, ic: str, dob:
         print(f"✅ Saved {captcha_file}")
 
         # solve captcha
-        text = get_captcha_text()
+        phase_start = time.monotonic()
+        text, result["solver"], captcha_cache_key = solve_captcha(captcha_file)
+        result["timings"]["captcha"] = round(time.monotonic() - phase_start, 3)
         await page.get_by_role("textbox", name="Enter text here:").fill(text)
         await page.get_by_role("button", name="Submit").click()
 
         # download PDF
+        phase_start = time.monotonic()
         try:
             btn = page.get_by_role("button", name="  Download PDF")
             await btn.wait_for(state="visible", timeout=10000)
@@ -65,6 +80,11 @@ async def download_arrival_card(resident: bool, arrival_date: str, ic: str, dob:
             print(f"✅ Downloaded {pdf_name}")
         except Exception as e:
             print(f"❌ Download failed: {e}")
+            result["outcome"] = "download_failed"
+            # the answer was likely rejected, don't serve it from the cache again
+            if invalidate_captcha(captcha_cache_key):
+                print("🗑️ Invalidated cached captcha answer")
+        result["timings"]["download"] = round(time.monotonic() - phase_start, 3)
 
         # cleanup
         if os.path.exists(captcha_file):
@@ -72,3 +92,5 @@ async def download_arrival_card(resident: bool, arrival_date: str, ic: str, dob:
             print(f"🗑️ Removed {captcha_file}")
 
         await browser.close()
+
+    return result
@@ -1,36 +1,33 @@
 import os
-import json
-import re
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ConversationHandler, filters, ContextTypes
 from validate_IC import validate_nric_fin
 from clicker import download_arrival_card
+from obtain_captcha import get_cache_stats
+from user_store import load_user_data, save_user_data, is_valid_email
+from bulk_import import import_roster
+from submission_history import record_submission, get_history, forget_user
+import outbound
 
 # Conversation states
 IC, DOB, EMAIL, ARRIVAL_DATE, SICK_QUESTION, CONFIRM_INFO = range(6)
 
-# File to store user data
-USER_DATA_FILE = "user_data.json"
+# Telegram user IDs allowed to run admin commands (comma separated)
+ADMIN_IDS = {i.strip() for i in os.environ.get("ADMIN_IDS", "").split(",") if i.strip()}
 
-# Email validation regex
-EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+# Number of row errors to list in the /import reply
+IMPORT_ERRORS_SHOWN = 10
 
-# Load user data
-def load_user_data():
-    if os.path.exists(USER_DATA_FILE):
-        with open(USER_DATA_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+# Submission history file work (appends, compaction, purges) runs off the event loop,
+# on a single worker so it never overlaps
+HISTORY_EXECUTOR = ThreadPoolExecutor(max_workers=1)
 
-# Save user data
-def save_user_data(data):
-    with open(USER_DATA_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
-
-# Validate email format
-def is_valid_email(email):
-    return EMAIL_REGEX.match(email) is not None
+async def run_history(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(HISTORY_EXECUTOR, func, *args)
 
 # Start command for new users
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -53,7 +50,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         
-        await update.message.reply_text(
+        await outbound.reply_text(
+            update.message,
             f"👋 *Welcome back!*\n\n"
             f"*Your saved information:*\n"
             f"━━━━━━━━━━━━━━━━━\n"
@@ -69,7 +67,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # New user - show welcome and disclaimer
     # First message with welcome and disclaimer
-    await update.message.reply_text(
+    await outbound.reply_text(
+        update.message,
         "*🇸🇬 Welcome to Singapore Arrival Card Bot!*\n\n"
         "I'll help you submit your arrival card quickly and easily.\n\n"
         "━━━━━━━━━━━━━━━━━\n"
@@ -84,7 +83,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     
     # Second message asking for NRIC/FIN
-    await update.message.reply_text(
+    await outbound.reply_text(
+        update.message,
         "📋 Please enter your *NRIC/FIN* number:",
         parse_mode='Markdown'
     )
@@ -95,7 +95,8 @@ async def get_ic(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ic = update.message.text.strip().upper()
     
     if ic == "/CANCEL":
-        await update.message.reply_text(
+        await outbound.reply_text(
+            update.message,
             "❌ *Process cancelled*\n\n"
             "Use /start to begin again.",
             parse_mode='Markdown'
@@ -103,7 +104,8 @@ async def get_ic(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     
     if not validate_nric_fin(ic):
-        await update.message.reply_text(
+        await outbound.reply_text(
+            update.message,
             "❌ *Invalid NRIC/FIN format*\n\n"
             "Please enter a valid NRIC/FIN or type /cancel to stop:\n\n"
             "_Format: 1 letter + 7 digits + 1 letter_\n"
@@ -113,7 +115,8 @@ async def get_ic(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return IC
     
     context.user_data['ic'] = ic
-    await update.message.reply_text(
+    await outbound.reply_text(
+        update.message,
         f"✅ *IC Validated!*\n"
         f"Your IC: `{ic}`\n\n"
         f"📅 Please enter your *Date of Birth*:\n\n"
@@ -132,7 +135,8 @@ async def get_dob(update: Update, context: ContextTypes.DEFAULT_TYPE):
         datetime.strptime(dob, "%d/%m/%Y")
         context.user_data['dob'] = dob
         
-        await update.message.reply_text(
+        await outbound.reply_text(
+            update.message,
             f"✅ *Date of Birth saved!*\n\n"
             f"📧 Please enter your *Email Address*:\n\n"
             f"_This will be used for your arrival card submission_\n"
@@ -141,7 +145,8 @@ async def get_dob(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return EMAIL
     except ValueError:
-        await update.message.reply_text(
+        await outbound.reply_text(
+            update.message,
             "❌ *Invalid date format*\n\n"
             "Please enter in DD/MM/YYYY format:\n"
             "_Example: 25/12/1990_",
@@ -154,7 +159,8 @@ async def get_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
     email = update.message.text.strip().lower()
     
     if not is_valid_email(email):
-        await update.message.reply_text(
+        await outbound.reply_text(
+            update.message,
             "❌ *Invalid email format*\n\n"
             "Please enter a valid email address:\n"
             "_Example: john.doe@gmail.com_",
@@ -168,7 +174,8 @@ async def get_email(update: Update, context: ContextTypes.DEFAULT_TYPE):
     keyboard = generate_date_buttons()
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    await update.message.reply_text(
+    await outbound.reply_text(
+        update.message,
         f"✅ *Email saved!*\n\n"
         f"✈️ *When are you entering Singapore?*\n\n"
         f"Please select your arrival date:",
@@ -215,7 +222,8 @@ async def arrival_date_callback(update: Update, context: ContextTypes.DEFAULT_TY
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    await query.edit_message_text(
+    await outbound.edit_message_text(
+        query,
         "🏥 *Health Declaration*\n\n"
         "Do you have any of the following?\n\n"
         "🤒 *Symptoms:* fever, cough, sore throat, runny nose, etc.\n"
@@ -233,7 +241,8 @@ async def sick_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     if query.data == "sick_yes":
-        await query.edit_message_text(
+        await outbound.edit_message_text(
+            query,
             "⚠️ *Health & Travel Advisory*\n\n"
             "Since you either:\n"
             "• Have health symptoms, or\n"
@@ -257,7 +266,8 @@ async def sick_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     
     # If not sick, proceed with submission
-    await query.edit_message_text(
+    await outbound.edit_message_text(
+        query,
         "⏳ *Processing your submission...*\n\n"
         "Please wait while I:\n"
         "• Fill out your arrival card\n"
@@ -277,6 +287,19 @@ async def sick_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     }
     save_user_data(user_data)
     
+    # Submission record for /history and analytics
+    submission = {
+        'user_id': user_id,
+        'submitted_at': datetime.now().isoformat(timespec='seconds'),
+        'arrival_date': context.user_data['arrival_date'],
+        'outcome': 'error',
+        'cause': None,
+        'solver': None,
+        'timings': {}
+    }
+    started = time.monotonic()
+    result = {}
+
     # Submit arrival card
     try:
         # Determine if it's NRIC (starts with S/T) or FIN (starts with F/G)
@@ -288,15 +311,18 @@ async def sick_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             arrival_date=context.user_data['arrival_date'],
             ic=ic,
             dob=context.user_data['dob'],
-            email=context.user_data['email']
+            email=context.user_data['email'],
+            result=result
         )
         
         # Send the PDF
         pdf_path = f"{ic}.pdf"
         if os.path.exists(pdf_path):
-            await context.bot.send_document(
+            upload_started = time.monotonic()
+            await outbound.send_document(
+                context.bot,
                 chat_id=update.effective_chat.id,
-                document=open(pdf_path, 'rb'),
+                document=pdf_path,
                 caption=(
                     "✅ *Success!*\n\n"
                     "Your Singapore Arrival Card has been generated.\n\n"
@@ -306,8 +332,13 @@ async def sick_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 ),
                 parse_mode='Markdown'
             )
+            submission['timings']['upload'] = round(time.monotonic() - upload_started, 3)
+            submission['outcome'] = 'success'
+            # Clean up the PDF file
+            os.remove(pdf_path)
             # Send follow-up message about data management
-            await context.bot.send_message(
+            await outbound.send_message(
+                context.bot,
                 chat_id=update.effective_chat.id,
                 text=(
                     "🔐 *Your Data & Quick Access*\n"
@@ -322,10 +353,11 @@ async def sick_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 ),
                 parse_mode='Markdown'
             )
-            # Clean up the PDF file
-            os.remove(pdf_path)
         else:
-            await context.bot.send_message(
+            submission['outcome'] = 'failed'
+            submission['cause'] = result['outcome']
+            await outbound.send_message(
+                context.bot,
                 chat_id=update.effective_chat.id,
                 text=(
                     "❌ *Generation Failed*\n\n"
@@ -336,16 +368,29 @@ async def sick_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 parse_mode='Markdown'
             )
     except Exception as e:
-        await context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text=(
-                f"❌ *Error Occurred*\n\n"
-                f"_{str(e)}_\n\n"
-                f"Please try again with /start or submit manually at:\n"
-                f"https://eservices.ica.gov.sg/sgarrivalcard/"
-            ),
-            parse_mode='Markdown'
-        )
+        # Once the PDF is delivered the submission counts as a success,
+        # even if a later message fails
+        if submission['outcome'] != 'success':
+            submission['outcome'] = 'error'
+            submission['cause'] = type(e).__name__
+            await outbound.send_message(
+                context.bot,
+                chat_id=update.effective_chat.id,
+                text=(
+                    f"❌ *Error Occurred*\n\n"
+                    f"_{str(e)}_\n\n"
+                    f"Please try again with /start or submit manually at:\n"
+                    f"https://eservices.ica.gov.sg/sgarrivalcard/"
+                ),
+                parse_mode='Markdown'
+            )
+    finally:
+        # Always record, even if the error message above could not be sent;
+        # keep the clicker phases measured before any exception
+        submission['solver'] = result.get('solver')
+        submission['timings'] = {**result.get('timings', {}), **submission['timings']}
+        submission['timings']['total'] = round(time.monotonic() - started, 3)
+        await run_history(record_submission, submission)
     
     return ConversationHandler.END
 
@@ -355,7 +400,8 @@ async def enter_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_data = load_user_data()
     
     if user_id not in user_data:
-        await update.message.reply_text(
+        await outbound.reply_text(
+            update.message,
             "❌ *No saved information found*\n\n"
             "You haven't registered yet!\n"
             "Please use /start to register first.",
@@ -376,7 +422,8 @@ async def enter_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    await update.message.reply_text(
+    await outbound.reply_text(
+        update.message,
         f"👋 *Welcome back!*\n\n"
         f"*Your saved information:*\n"
         f"━━━━━━━━━━━━━━━━━\n"
@@ -396,13 +443,15 @@ async def confirm_info_callback(update: Update, context: ContextTypes.DEFAULT_TY
     await query.answer()
     
     if query.data == "info_incorrect":
-        await query.edit_message_text(
+        await outbound.edit_message_text(
+            query,
             "📝 *Update Required*\n\n"
             "Please provide your updated information:",
             parse_mode='Markdown'
         )
         # Send the welcome messages for re-registration
-        await context.bot.send_message(
+        await outbound.send_message(
+            context.bot,
             chat_id=update.effective_chat.id,
             text=(
                 "*🇸🇬 Let's update your information*\n\n"
@@ -417,7 +466,8 @@ async def confirm_info_callback(update: Update, context: ContextTypes.DEFAULT_TY
             parse_mode='Markdown',
             disable_web_page_preview=True
         )
-        await context.bot.send_message(
+        await outbound.send_message(
+            context.bot,
             chat_id=update.effective_chat.id,
             text="📋 Please enter your *NRIC/FIN* number:",
             parse_mode='Markdown'
@@ -428,7 +478,8 @@ async def confirm_info_callback(update: Update, context: ContextTypes.DEFAULT_TY
     keyboard = generate_date_buttons()
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    await query.edit_message_text(
+    await outbound.edit_message_text(
+        query,
         "✈️ *Quick Check-in*\n\n"
         "*When are you entering Singapore?*\n\n"
         "Please select your arrival date:",
@@ -439,7 +490,8 @@ async def confirm_info_callback(update: Update, context: ContextTypes.DEFAULT_TY
 
 # Cancel command
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
+    await outbound.reply_text(
+        update.message,
         "🚫 *Process cancelled*\n\n"
         "You can start again anytime:\n"
         "• /start - New registration\n"
@@ -454,7 +506,8 @@ async def delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_data = load_user_data()
     
     if user_id not in user_data:
-        await update.message.reply_text(
+        await outbound.reply_text(
+            update.message,
             "❌ *No Data Found*\n\n"
             "You don't have any stored information to delete.",
             parse_mode='Markdown'
@@ -471,7 +524,8 @@ async def delete(update: Update, context: ContextTypes.DEFAULT_TYPE):
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     saved_info = user_data[user_id]
-    await update.message.reply_text(
+    await outbound.reply_text(
+        update.message,
         "⚠️ *Delete Personal Data*\n"
         "━━━━━━━━━━━━━━━━━\n\n"
         "*The following data will be deleted:*\n"
@@ -491,7 +545,8 @@ async def delete_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     
     if query.data == "delete_cancel":
-        await query.edit_message_text(
+        await outbound.edit_message_text(
+            query,
             "✅ *Data Preserved*\n\n"
             "Your information has been kept safe.\n"
             "You can continue using the service as usual.",
@@ -506,8 +561,10 @@ async def delete_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if user_id in user_data:
         del user_data[user_id]
         save_user_data(user_data)
+        await run_history(forget_user, user_id)
         
-        await query.edit_message_text(
+        await outbound.edit_message_text(
+            query,
             "🗑️ *Data Deleted Successfully*\n\n"
             "All your personal information has been removed from our system.\n\n"
             "If you wish to use this service again:\n"
@@ -515,16 +572,50 @@ async def delete_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
             parse_mode='Markdown'
         )
     else:
-        await query.edit_message_text(
+        await outbound.edit_message_text(
+            query,
             "❌ *Error*\n\n"
             "No data found to delete.\n"
             "You may have already deleted your information.",
             parse_mode='Markdown'
         )
 
+# History command - show past submissions
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+    total, submissions = await run_history(get_history, user_id)
+
+    if not submissions:
+        await outbound.reply_text(
+            update.message,
+            "📜 *No Submissions Yet*\n\n"
+            "Use /start or /enter to submit your arrival card.",
+            parse_mode='Markdown'
+        )
+        return
+
+    lines = []
+    for submission in submissions:
+        submitted_at = datetime.fromisoformat(submission['submitted_at'])
+        status = "✅" if submission['outcome'] == 'success' else "❌"
+        lines.append(
+            f"{status} {submitted_at.strftime('%d %b %Y, %H:%M')} "
+            f"(arrival `{submission['arrival_date']}`) "
+            f"- {submission['timings'].get('total', 0):.0f}s"
+        )
+    await outbound.reply_text(
+        update.message,
+        f"📜 *Your Submissions*\n"
+        f"━━━━━━━━━━━━━━━━━\n\n"
+        + "\n".join(lines) +
+        f"\n\n_Showing {len(submissions)} of {total}_",
+        parse_mode='Markdown'
+    )
+
 # Help command
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text(
+    await outbound.reply_text(
+        update.message,
         "🤖 *Singapore Arrival Card Bot*\n"
         "━━━━━━━━━━━━━━━━━\n\n"
         "*Available Commands:*\n\n"
@@ -532,6 +623,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "🔄 /enter - Quick check-in (returning users)\n"
         "❌ /cancel - Cancel current operation\n"
         "🗑️ /delete - Delete your stored data\n"
+        "📜 /history - View your past submissions\n"
         "❓ /help - Show this help message\n\n"
         "*How it works:*\n"
         "1. First time? Use /start to register\n"
@@ -541,17 +633,94 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode='Markdown'
     )
 
+# Bulk roster import (admins only) - CSV document sent with caption /import
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+    if user_id not in ADMIN_IDS:
+        return
+
+    document = update.message.document
+    if document is None:
+        await outbound.reply_text(
+            update.message,
+            "📥 *Bulk Import*\n\n"
+            "Send a CSV file with the caption /import\n\n"
+            "Columns: `telegram_id, ic, dob, email`",
+            parse_mode='Markdown'
+        )
+        return
+
+    csv_path = f"roster_{user_id}.csv"
+    roster_file = await document.get_file()
+    await roster_file.download_to_drive(csv_path)
+    try:
+        imported, errors = import_roster(csv_path)
+    except ValueError as e:
+        await outbound.reply_text(
+            update.message,
+            f"❌ *Import Failed*\n\n`{str(e)}`",
+            parse_mode='Markdown'
+        )
+        return
+    finally:
+        os.remove(csv_path)
+
+    error_lines = "".join(
+        f"• Line {line}: `{error}`\n" for line, error in errors[:IMPORT_ERRORS_SHOWN]
+    )
+    if len(errors) > IMPORT_ERRORS_SHOWN:
+        error_lines += f"• _...and {len(errors) - IMPORT_ERRORS_SHOWN} more_\n"
+    await outbound.reply_text(
+        update.message,
+        f"📥 *Bulk Import Complete*\n"
+        f"━━━━━━━━━━━━━━━━━\n\n"
+        f"✅ *Imported:* {imported}\n"
+        f"❌ *Invalid rows:* {len(errors)}\n\n"
+        f"{error_lines}",
+        parse_mode='Markdown'
+    )
+
+# Bot metrics (admins only)
+async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    user_id = str(update.effective_user.id)
+    if user_id not in ADMIN_IDS:
+        return
+
+    metrics = outbound.get_metrics()
+    captcha = get_cache_stats()
+    latency_lines = "".join(
+        f"• {lane}: p50 `{lat['p50']:.2f}s` | p99 `{lat['p99']:.2f}s`\n"
+        for lane, lat in metrics['latency'].items()
+    )
+    await outbound.reply_text(
+        update.message,
+        f"📊 *Bot Stats*\n"
+        f"━━━━━━━━━━━━━━━━━\n\n"
+        f"📤 *Sent:* {metrics['sent']['text']} text, {metrics['sent']['document']} documents\n"
+        f"❌ *Failed:* {metrics['failed']['text']} text, {metrics['failed']['document']} documents\n"
+        f"🚦 *Throttled:* {metrics['throttled']} (Retry-After: {metrics['retry_after']})\n\n"
+        f"⏱ *Delivery latency:*\n"
+        f"{latency_lines}\n"
+        f"🔐 *Captcha cache:* {captcha['hits']} hits, {captcha['misses']} misses "
+        f"({captcha['hit_rate']:.0%}), {captcha['size']} cached",
+        parse_mode='Markdown'
+    )
+
 def main():
     # Get bot token from environment variable or hardcode it
     BOT_TOKEN = os.environ["TELEGRAM_BOT_TOKEN"]
     
     # Create application
-    application = Application.builder().token(BOT_TOKEN).build()
+    application = Application.builder().token(BOT_TOKEN).request(outbound.build_request()).build()
     
     # Add simple command handlers first (these have priority)
     application.add_handler(CommandHandler("delete", delete))
     application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(CommandHandler("history", history_command))
     application.add_handler(CallbackQueryHandler(delete_callback, pattern="^delete_"))
+    application.add_handler(CommandHandler("import", import_command))
+    application.add_handler(CommandHandler("stats", stats_command))
+    application.add_handler(MessageHandler(filters.Document.FileExtension("csv") & filters.CaptionRegex(r"^/import"), import_command))
     
     # Create conversation handler for start/registration flow
     # Now handles both new users and returning users
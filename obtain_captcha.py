@@ -2,23 +2,142 @@ from openai import OpenAI
 
 client = OpenAI(api_key='')
 import base64
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+# Captcha answer cache: max entries, entry lifetime in seconds, optional file to persist to
+CAPTCHA_CACHE_SIZE = int(os.environ.get("CAPTCHA_CACHE_SIZE", "512"))
+CAPTCHA_CACHE_TTL = float(os.environ.get("CAPTCHA_CACHE_TTL", "3600"))
+CAPTCHA_CACHE_FILE = os.environ.get("CAPTCHA_CACHE_FILE")
+
+# Vision model used to solve captchas
+CAPTCHA_MODEL = "gpt-4.1-mini"
+
+# sha256 of the decoded image bytes -> [answer, time stored], least recently used first
+_captcha_cache = OrderedDict()
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+# Load persisted cache entries (an unreadable or corrupt file just means starting empty)
+def _load_cache():
+    if not (CAPTCHA_CACHE_FILE and os.path.exists(CAPTCHA_CACHE_FILE)):
+        return
+    try:
+        with open(CAPTCHA_CACHE_FILE, 'r') as f:
+            entries = json.load(f)
+        now = time.time()
+        for key, (answer, stored_at) in entries.items():
+            if now - stored_at < CAPTCHA_CACHE_TTL:
+                _captcha_cache[key] = [answer, stored_at]
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        print(f"❌ Ignoring unreadable captcha cache {CAPTCHA_CACHE_FILE}: {e}")
+        _captcha_cache.clear()
+        return
+    while len(_captcha_cache) > CAPTCHA_CACHE_SIZE:
+        _captcha_cache.popitem(last=False)
+
+# Persist cache entries (no-op unless CAPTCHA_CACHE_FILE is set; a failed write keeps the in-memory cache)
+def _save_cache():
+    if not CAPTCHA_CACHE_FILE:
+        return
+    tmp_file = f"{CAPTCHA_CACHE_FILE}.tmp"
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(dict(_captcha_cache), f)
+        os.replace(tmp_file, CAPTCHA_CACHE_FILE)
+    except OSError as e:
+        print(f"❌ Could not save captcha cache {CAPTCHA_CACHE_FILE}: {e}")
+
+def captcha_key(image_bytes: bytes) -> str:
+    """Cache key for a captcha: hash of its decoded image bytes."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def _cache_get(key):
+    entry = _captcha_cache.get(key)
+    if entry is None:
+        _cache_stats["misses"] += 1
+        return None
+    answer, stored_at = entry
+    if time.time() - stored_at >= CAPTCHA_CACHE_TTL:
+        del _captcha_cache[key]
+        _cache_stats["misses"] += 1
+        _cache_stats["evictions"] += 1
+        return None
+    _captcha_cache.move_to_end(key)
+    _cache_stats["hits"] += 1
+    return answer
+
+def _cache_put(key, answer):
+    _captcha_cache[key] = [answer, time.time()]
+    _captcha_cache.move_to_end(key)
+    while len(_captcha_cache) > CAPTCHA_CACHE_SIZE:
+        _captcha_cache.popitem(last=False)
+        _cache_stats["evictions"] += 1
+    _save_cache()
+
+def invalidate_captcha(key):
+    """
+    Drop a cached captcha answer, e.g. after the site rejected it.
+
+    Args:
+        key (str): Cache key returned by solve_captcha
+
+    Returns:
+        bool: True if an entry was removed
+    """
+    if _captcha_cache.pop(key, None) is None:
+        return False
+    _cache_stats["invalidations"] += 1
+    _save_cache()
+    return True
+
+def get_cache_stats():
+    """Return captcha cache counters, current size and hit rate."""
+    lookups = _cache_stats["hits"] + _cache_stats["misses"]
+    return {
+        **_cache_stats,
+        "size": len(_captcha_cache),
+        "hit_rate": _cache_stats["hits"] / lookups if lookups else 0.0,
+    }
 
 def get_captcha_text(image_path="captcha.png"):
     """
     Extract captcha text from an image using OpenAI's vision model.
-    
+
+    Answers are cached by a hash of the image bytes, so an image that was
+    already solved skips the remote call.
+
     Args:
         image_path (str): Path to the captcha image file
         api_key (str): OpenAI API key
-        
+
     Returns:
         str: The extracted captcha text
     """
+    return solve_captcha(image_path)[0]
+
+def solve_captcha(image_path="captcha.png"):
+    """
+    Same as get_captcha_text, but also reports where the answer came from.
+
+    Returns:
+        tuple: (captcha text, solver, cache key) where solver is "cache" or the
+        model name; pass the key to invalidate_captcha if the answer is rejected
+    """
     # Set your OpenAI API key
 
-    # Read and encode the image
+    # Read the image and check the cache
     with open(image_path, "rb") as image_file:
-        encoded_image = base64.b64encode(image_file.read()).decode('utf-8')
+        image_bytes = image_file.read()
+    key = captcha_key(image_bytes)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached, "cache", key
+
+    # Encode the image
+    encoded_image = base64.b64encode(image_bytes).decode('utf-8')
 
     # Create the message payload
     messages = [
@@ -37,8 +156,12 @@ def get_captcha_text(image_path="captcha.png"):
     ]
 
     # Send the request to the GPT-4.1 Mini model
-    response = client.chat.completions.create(model="gpt-4.1-mini",
+    response = client.chat.completions.create(model=CAPTCHA_MODEL,
     messages=messages)
 
-    # Return the response with no spaces
-    return response.choices[0].message.content.replace(" ", "")
+    # Cache and return the response with no spaces
+    text = response.choices[0].message.content.replace(" ", "")
+    _cache_put(key, text)
+    return text, CAPTCHA_MODEL, key
+
+_load_cache()
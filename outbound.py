@@ -0,0 +1,198 @@
+import asyncio
+import time
+from collections import deque
+from telegram.error import RetryAfter
+from telegram.request import HTTPXRequest
+
+# Telegram flood limits: ~30 messages/s for the whole bot, ~1 message/s per chat (short bursts allowed)
+GLOBAL_RATE, GLOBAL_BURST = 30, 30
+CHAT_RATE, CHAT_BURST = 1, 3
+
+# Concurrent sends per lane. PDF uploads get their own lane so small text edits never queue behind them.
+LANE_CONCURRENCY = {"text": 24, "document": 4}
+
+# Times to retry a send after Telegram answers 429 Retry-After
+MAX_RETRIES = 3
+
+# A 429 only pauses its own chat, unless this many different chats get one within the window:
+# then Telegram is limiting the whole bot and every chat backs off
+GLOBAL_BACKOFF_CHATS = 3
+GLOBAL_BACKOFF_WINDOW = 10.0
+
+# Seconds allowed for uploading a PDF (PTB otherwise uses a fixed 20s for any upload)
+DOCUMENT_WRITE_TIMEOUT = 60.0
+
+# Keep-alive HTTP connection pool shared by all outbound calls (must cover both lanes)
+CONNECTION_POOL_SIZE = sum(LANE_CONCURRENCY.values())
+
+# Idle per-chat buckets are dropped once there are this many
+MAX_CHAT_BUCKETS = 1000
+
+# Latency samples kept per lane for percentiles
+LATENCY_SAMPLES = 1000
+
+class TokenBucket:
+    """Token bucket allowing `capacity` sends at once, refilled at `rate` per second."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        """Hold back all sends for `seconds` (used for Retry-After)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def is_idle(self):
+        self._refill()
+        return self.tokens >= self.capacity and time.monotonic() >= self.paused_until
+
+    async def acquire(self):
+        """Wait for a token. Returns True if the caller had to wait for it."""
+        waited = False
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                waited = True
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return waited
+            waited = True
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+_global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+_chat_buckets = {}
+_lane_slots = {}
+
+_metrics = {
+    "sent": {lane: 0 for lane in LANE_CONCURRENCY},
+    "failed": {lane: 0 for lane in LANE_CONCURRENCY},
+    "throttled": 0,      # sends delayed by our own token buckets
+    "retry_after": 0,    # 429 responses from Telegram
+}
+_latencies = {lane: deque(maxlen=LATENCY_SAMPLES) for lane in LANE_CONCURRENCY}
+# (time, chat_id) of recent 429 responses
+_recent_retry_afters = deque()
+
+def _chat_bucket(chat_id):
+    bucket = _chat_buckets.get(chat_id)
+    if bucket is None:
+        if len(_chat_buckets) >= MAX_CHAT_BUCKETS:
+            for idle_id in [cid for cid, b in _chat_buckets.items() if b.is_idle()]:
+                del _chat_buckets[idle_id]
+        bucket = _chat_buckets[chat_id] = TokenBucket(CHAT_RATE, CHAT_BURST)
+    return bucket
+
+def _back_off(chat_id, chat_bucket, seconds):
+    """Pause the chat for a Retry-After; pause everyone if several chats were limited recently."""
+    chat_bucket.pause(seconds)
+    now = time.monotonic()
+    _recent_retry_afters.append((now, chat_id))
+    while _recent_retry_afters[0][0] < now - GLOBAL_BACKOFF_WINDOW:
+        _recent_retry_afters.popleft()
+    if len({cid for _, cid in _recent_retry_afters}) >= GLOBAL_BACKOFF_CHATS:
+        _global_bucket.pause(seconds)
+        _recent_retry_afters.clear()
+
+def _lane_slot(lane):
+    # Created lazily so the semaphores belong to the running event loop
+    if lane not in _lane_slots:
+        _lane_slots[lane] = asyncio.Semaphore(LANE_CONCURRENCY[lane])
+    return _lane_slots[lane]
+
+async def _dispatch(chat_id, lane, call):
+    """
+    Run a Bot API call once the chat and global buckets allow it.
+
+    call: zero-argument function returning a fresh coroutine (called again on retry)
+    Retries after Telegram's Retry-After up to MAX_RETRIES times, then re-raises.
+    All waiting happens before taking a lane slot, so a throttled chat never
+    holds a slot other chats could use.
+    """
+    start = time.monotonic()
+    for attempt in range(MAX_RETRIES + 1):
+        chat_bucket = _chat_bucket(chat_id)
+        chat_waited = await chat_bucket.acquire()
+        global_waited = await _global_bucket.acquire()
+        if chat_waited or global_waited:
+            _metrics["throttled"] += 1
+        try:
+            async with _lane_slot(lane):
+                result = await call()
+        except RetryAfter as e:
+            _metrics["retry_after"] += 1
+            if attempt == MAX_RETRIES:
+                _metrics["failed"][lane] += 1
+                raise
+            _back_off(chat_id, chat_bucket, float(e.retry_after))
+            continue
+        except Exception:
+            _metrics["failed"][lane] += 1
+            raise
+        _metrics["sent"][lane] += 1
+        _latencies[lane].append(time.monotonic() - start)
+        return result
+
+async def reply_text(message, text, **kwargs):
+    """Rate-limited `message.reply_text`."""
+    return await _dispatch(message.chat_id, "text", lambda: message.reply_text(text, **kwargs))
+
+async def edit_message_text(query, text, **kwargs):
+    """Rate-limited `query.edit_message_text`."""
+    return await _dispatch(query.message.chat_id, "text", lambda: query.edit_message_text(text, **kwargs))
+
+async def send_message(bot, chat_id, text, **kwargs):
+    """Rate-limited `bot.send_message`."""
+    return await _dispatch(chat_id, "text", lambda: bot.send_message(chat_id=chat_id, text=text, **kwargs))
+
+async def send_document(bot, chat_id, document, **kwargs):
+    """
+    Rate-limited `bot.send_document` on the upload lane.
+
+    document: path to the file, reopened on every attempt so retries resend it from the start
+    """
+    kwargs.setdefault("write_timeout", DOCUMENT_WRITE_TIMEOUT)
+
+    async def call():
+        with open(document, 'rb') as f:
+            return await bot.send_document(chat_id=chat_id, document=f, **kwargs)
+    return await _dispatch(chat_id, "document", call)
+
+def build_request():
+    """HTTP client for outbound Bot API calls, with a keep-alive pool sized for both lanes."""
+    return HTTPXRequest(
+        connection_pool_size=CONNECTION_POOL_SIZE,
+        connect_timeout=5.0,
+        read_timeout=10.0,
+        write_timeout=10.0,
+        pool_timeout=10.0
+    )
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def get_metrics():
+    """Return send counts, throttling events and p50/p99 delivery latency (seconds) per lane."""
+    return {
+        "sent": dict(_metrics["sent"]),
+        "failed": dict(_metrics["failed"]),
+        "throttled": _metrics["throttled"],
+        "retry_after": _metrics["retry_after"],
+        "latency": {
+            lane: {"p50": _percentile(samples, 50), "p99": _percentile(samples, 99)}
+            for lane, samples in _latencies.items()
+        },
+    }
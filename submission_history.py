@@ -0,0 +1,284 @@
+import argparse
+import csv
+import json
+import os
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+
+# Append-only submission log, split into numbered segment files
+HISTORY_DIR = "history"
+SEGMENT_PREFIX = "submissions-"
+MAX_SEGMENT_BYTES = 16 * 1024 * 1024
+# Oldest segments beyond this are deleted once compacted
+MAX_SEGMENTS = 64
+
+# Per-user index built by compaction, plus the log position it covers
+INDEX_DIR = os.path.join(HISTORY_DIR, "users")
+CHECKPOINT_FILE = os.path.join(HISTORY_DIR, "checkpoint.json")
+# Compact once this many log bytes are not in the index yet
+COMPACT_BYTES = 1024 * 1024
+# Submissions kept per user in the index
+HISTORY_PER_USER = 20
+
+def _segment_path(segment):
+    return os.path.join(HISTORY_DIR, f"{SEGMENT_PREFIX}{segment:06d}.jsonl")
+
+def _segments():
+    if not os.path.isdir(HISTORY_DIR):
+        return []
+    return sorted(
+        int(name[len(SEGMENT_PREFIX):-len(".jsonl")])
+        for name in os.listdir(HISTORY_DIR)
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(".jsonl")
+    )
+
+def _user_index_path(user_id):
+    return os.path.join(INDEX_DIR, f"{user_id}.json")
+
+# Write JSON via a temp file so readers never see a half-written file
+def _write_json(path, data):
+    tmp_file = f"{path}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_file, path)
+
+def _load_checkpoint():
+    if os.path.exists(CHECKPOINT_FILE):
+        with open(CHECKPOINT_FILE, 'r') as f:
+            return json.load(f)
+    return {"segment": 0, "offset": 0}
+
+def _load_user_index(user_id):
+    path = _user_index_path(user_id)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {"total": 0, "submissions": []}
+
+# Bytes that appear in every log line belonging to the user
+def _user_needle(user_id):
+    return json.dumps({"user_id": user_id})[1:-1].encode()
+
+def _read_log(segment=0, offset=0, user_id=None):
+    """
+    Yield (segment, end offset, record) for every log line from the given position on.
+
+    user_id: only parse lines that mention this user (cheap pre-filter before json.loads)
+    """
+    needle = _user_needle(user_id) if user_id else None
+    for seg in _segments():
+        if seg < segment:
+            continue
+        with open(_segment_path(seg), 'rb') as f:
+            if seg == segment:
+                f.seek(offset)
+            pos = f.tell()
+            for line in f:
+                # a line without newline is still being written
+                if not line.endswith(b"\n"):
+                    break
+                pos += len(line)
+                if needle is None or needle in line:
+                    yield seg, pos, json.loads(line)
+
+def record_submission(record):
+    """
+    Append one submission to the log, rotating to a new segment when the active one is full.
+
+    record: dict with user_id, submitted_at, arrival_date, outcome, cause, solver, timings
+    Compacts the log into the per-user index once enough new bytes have built up.
+    """
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    segments = _segments()
+    segment = segments[-1] if segments else 1
+    path = _segment_path(segment)
+    if os.path.exists(path) and os.path.getsize(path) >= MAX_SEGMENT_BYTES:
+        segment += 1
+        path = _segment_path(segment)
+
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + "\n")
+        size = f.tell()
+
+    checkpoint = _load_checkpoint()
+    if segment > checkpoint["segment"] or size - checkpoint["offset"] >= COMPACT_BYTES:
+        compact()
+
+def _fold(start, end=None, batch=None):
+    """
+    Fold log records after `start` (up to `end`, or the end of the log) into the per-user index.
+
+    The target position and a batch id are saved in the checkpoint as "pending"
+    before any index file is written, and each index remembers the last batch it
+    took in. If this is interrupted, replaying the same pending batch skips users
+    whose index already has it, so no record is counted twice.
+    """
+    new_records = defaultdict(list)
+    last = None
+    for segment, offset, record in _read_log(start["segment"], start["offset"]):
+        if end is not None and (segment, offset) > (end["segment"], end["offset"]):
+            break
+        new_records[record["user_id"]].append(record)
+        last = (segment, offset)
+    if last is None:
+        if batch:
+            _write_json(CHECKPOINT_FILE, start)
+        return start
+
+    pending = batch or {"batch": uuid.uuid4().hex, "segment": last[0], "offset": last[1]}
+    _write_json(CHECKPOINT_FILE, {"segment": start["segment"], "offset": start["offset"], "pending": pending})
+
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    for user_id, records in new_records.items():
+        index = _load_user_index(user_id)
+        if index.get("batch") == pending["batch"]:
+            continue
+        index["total"] += len(records)
+        index["submissions"] = (records[::-1] + index["submissions"])[:HISTORY_PER_USER]
+        index["batch"] = pending["batch"]
+        _write_json(_user_index_path(user_id), index)
+
+    checkpoint = {"segment": pending["segment"], "offset": pending["offset"]}
+    _write_json(CHECKPOINT_FILE, checkpoint)
+    return checkpoint
+
+def compact():
+    """Fold new log records into the per-user index and drop old, fully compacted segments."""
+    checkpoint = _load_checkpoint()
+    pending = checkpoint.pop("pending", None)
+    if pending:
+        # finish the interrupted batch exactly before taking in anything newer
+        checkpoint = _fold(checkpoint, end=pending, batch=pending)
+    checkpoint = _fold(checkpoint)
+
+    segments = _segments()
+    for segment in segments[:-MAX_SEGMENTS]:
+        if segment < checkpoint["segment"]:
+            os.remove(_segment_path(segment))
+
+def get_history(user_id, limit=10):
+    """
+    Return (total submissions, most recent submissions first) for a user.
+
+    Reads the user's index file plus only the log records not compacted yet.
+    """
+    user_id = str(user_id)
+    checkpoint = _load_checkpoint()
+    if "pending" in checkpoint:
+        # an interrupted compaction left the index ahead of the checkpoint
+        compact()
+        checkpoint = _load_checkpoint()
+    index = _load_user_index(user_id)
+    recent = [
+        record for _, _, record in _read_log(checkpoint["segment"], checkpoint["offset"], user_id)
+        if record["user_id"] == user_id
+    ]
+    submissions = (recent[::-1] + index["submissions"])[:limit]
+    return index["total"] + len(recent), submissions
+
+def forget_user(user_id):
+    """
+    Remove every submission of a user from the log and the index.
+
+    The log is only ever appended to, except here: each segment holding the
+    user's lines is rewritten without them. This reads the whole log, which is
+    fine for an explicit data deletion request.
+    """
+    user_id = str(user_id)
+    compact()
+    checkpoint = _load_checkpoint()
+    needle = _user_needle(user_id)
+
+    for segment in _segments():
+        path = _segment_path(segment)
+        tmp_file = f"{path}.tmp"
+        removed = False
+        pos = 0
+        with open(path, 'rb') as src, open(tmp_file, 'wb') as dst:
+            for line in src:
+                pos += len(line)
+                if needle in line and json.loads(line)["user_id"] == user_id:
+                    removed = True
+                    # keep the checkpoint pointing at the same record after the rewrite
+                    if segment == checkpoint["segment"] and pos <= checkpoint["offset"]:
+                        checkpoint["offset"] -= len(line)
+                    continue
+                dst.write(line)
+        if removed:
+            os.replace(tmp_file, path)
+        else:
+            os.remove(tmp_file)
+    _write_json(CHECKPOINT_FILE, checkpoint)
+
+    path = _user_index_path(user_id)
+    if os.path.exists(path):
+        os.remove(path)
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def export_stats(out_path, causes_path=None):
+    """
+    Write per-hour submission stats (count, failure rate, p50/p99 total seconds) to a CSV,
+    and failure causes with their counts to a second CSV.
+
+    causes_path: defaults to out_path with "_causes" added before the extension
+    Returns (causes CSV path, Counter of failure causes).
+    """
+    if causes_path is None:
+        root, ext = os.path.splitext(out_path)
+        causes_path = f"{root}_causes{ext or '.csv'}"
+
+    durations = defaultdict(list)
+    failures = Counter()
+    causes = Counter()
+    for _, _, record in _read_log():
+        hour = datetime.fromisoformat(record["submitted_at"]).hour
+        durations[hour].append(record["timings"].get("total", 0.0))
+        if record["outcome"] != "success":
+            failures[hour] += 1
+            causes[record["cause"] or record["outcome"]] += 1
+
+    with open(out_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["hour", "submissions", "failure_rate", "p50_seconds", "p99_seconds"])
+        for hour in sorted(durations):
+            samples = durations[hour]
+            writer.writerow([
+                hour,
+                len(samples),
+                round(failures[hour] / len(samples), 4),
+                round(_percentile(samples, 50), 3),
+                round(_percentile(samples, 99), 3)
+            ])
+
+    with open(causes_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["cause", "count"])
+        writer.writerows(causes.most_common())
+    return causes_path, causes
+
+def main():
+    parser = argparse.ArgumentParser(description="Submission history maintenance and analytics.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("compact", help="fold new log records into the per-user index")
+    export_parser = subparsers.add_parser("export", help="write per-hour stats and failure causes to CSVs")
+    export_parser.add_argument("out_path", help="CSV file for per-hour stats")
+    export_parser.add_argument("--causes", help="CSV file for failure causes (default: <out_path>_causes.csv)")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        compact()
+        print("✅ Compacted submission log")
+    else:
+        causes_path, causes = export_stats(args.out_path, args.causes)
+        print(f"✅ Wrote {args.out_path} and {causes_path}")
+        for cause, count in causes.most_common():
+            print(f"❌ {cause}: {count}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import os
+import json
+import re
+from datetime import datetime
+
+# File to store user data
+USER_DATA_FILE = "user_data.json"
+
+# Email validation regex
+EMAIL_REGEX = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+
+# Load user data
+def load_user_data():
+    if os.path.exists(USER_DATA_FILE):
+        with open(USER_DATA_FILE, 'r') as f:
+            return json.load(f)
+    return {}
+
+# Save user data (written to a temp file first so a crash never leaves a half-written store)
+def save_user_data(data):
+    tmp_file = f"{USER_DATA_FILE}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_file, USER_DATA_FILE)
+
+# Validate email format
+def is_valid_email(email):
+    return EMAIL_REGEX.match(email) is not None
+
+# Validate date of birth format (DD/MM/YYYY)
+def is_valid_dob(dob):
+    try:
+        datetime.strptime(dob, "%d/%m/%Y")
+        return True
+    except ValueError:
+        return False
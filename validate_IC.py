@@ -1,32 +1,44 @@
 import re
+from operator import mul
+
+# Format: 1 letter [S/T/F/G] + 7 digits + 1 checksum letter
+NRIC_FIN_REGEX = re.compile(r"[STFG][0-9]{7}[A-Z]")
+
+# Digit weights, and their sum (used to drop the ASCII '0' offset from all digits at once)
+WEIGHTS = (2, 7, 6, 5, 4, 3, 2)
+WEIGHTED_ZERO = ord("0") * sum(WEIGHTS)
+
+# Per-prefix offset and checksum table
+PREFIX_OFFSET = {"S": 0, "T": 4, "F": 0, "G": 4}
+CHECKSUM_TABLE = {"S": "JZIHGFEDCBA", "T": "JZIHGFEDCBA", "F": "XWUTRQPNMLK", "G": "XWUTRQPNMLK"}
+
+def _checksum_ok(id_str: str) -> bool:
+    # Weighted sum of the 7 digits, computed on their ASCII codes
+    total = sum(map(mul, id_str[1:8].encode(), WEIGHTS)) - WEIGHTED_ZERO
+    prefix = id_str[0]
+    return id_str[8] == CHECKSUM_TABLE[prefix][(total + PREFIX_OFFSET[prefix]) % 11]
 
 def validate_nric_fin(id_str: str) -> bool:
     """
     Validate a Singapore NRIC or FIN.
-    
+
     NRIC/FIN format: 1 letter [S/T/F/G] + 7 digits + 1 checksum letter.
     Returns True if format and checksum are valid, False otherwise.
     """
     id_str = id_str.strip().upper()
-    if not re.fullmatch(r"[STFG]\d{7}[A-Z]", id_str):
+    if not NRIC_FIN_REGEX.fullmatch(id_str):
         return False
+    return _checksum_ok(id_str)
 
-    prefix, digits, checksum = id_str[0], id_str[1:8], id_str[8]
-    weights = [2, 7, 6, 5, 4, 3, 2]
-
-    # 1) Compute weighted sum of digits
-    total = sum(int(d) * w for d, w in zip(digits, weights))
-
-    # 2) Add offset of 4 if prefix in T or G
-    if prefix in ("T", "G"):
-        total += 4
-
-    # 3) Choose the correct checksum table
-    if prefix in ("S", "T"):
-        table = list("JZIHGFEDCBA")
-    else:  # F or G
-        table = list("XWUTRQPNMLK")
+def validate_nric_fin_batch(ids) -> list:
+    """
+    Validate many NRIC/FINs in one pass.
 
-    # 4) remainder → index into table
-    idx = total % 11
-    return checksum == table[idx]
+    Format checks run over the whole batch first, then checksums are computed
+    only for the well-formed ones.
+    Returns a list of booleans in the same order as `ids`.
+    """
+    ids = [id_str.strip().upper() for id_str in ids]
+    fullmatch = NRIC_FIN_REGEX.fullmatch
+    well_formed = [fullmatch(id_str) is not None for id_str in ids]
+    return [ok and _checksum_ok(id_str) for id_str, ok in zip(ids, well_formed)]